@@ -14,30 +14,91 @@ Output: JSON array of today's events with attendees
 
 import json
 import argparse
+import hashlib
 import os
 import sys
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Any, Dict, Iterator, List, Sequence
 
+import httplib2
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.model import JsonModel
+
+try:
+    import orjson  # optional: faster JSON output
+except ImportError:
+    orjson = None
 
 # Configuration
 SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
 TOKEN_PATH = Path.home() / '.google' / 'token.json'
 CREDENTIALS_PATH = Path.home() / '.google' / 'credentials.json'
+PROFILE_PATH = Path.home() / '.google' / 'profile.json'
+
+# Partial response: only the event fields this script actually reads
+EVENT_FIELDS = (
+    'items(id,summary,start,end,attendees(email,responseStatus),organizer/email,'
+    'status,location,description,htmlLink,eventType),nextPageToken'
+)
+MAX_RESULTS_PER_PAGE = 2500  # API maximum; the default page size is 250
+
+# Local timezone, resolved once at import instead of per call
+_LOCAL_TZ = datetime.now().astimezone().tzinfo
+
+def write_json(obj: Any, stream, indent: bool = False) -> None:
+    """Write obj as a line of JSON to a text stream, via orjson when installed."""
+    buffer = getattr(stream, 'buffer', None)
+    if orjson is not None and buffer is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        stream.flush()
+        buffer.write(orjson.dumps(obj, option=option))
+        buffer.flush()
+    else:
+        print(json.dumps(obj, indent=2 if indent else None, ensure_ascii=False), file=stream)
+
+class OrjsonModel(JsonModel):
+    """JsonModel that decodes API responses with orjson instead of json.loads."""
+
+    def deserialize(self, content):
+        body = orjson.loads(content)
+        if self._data_wrapper and isinstance(body, dict) and 'data' in body:
+            body = body['data']
+        return body
+
+# In-process caches (reused when fetch_today_events is called repeatedly)
+_CREDS_CACHE: Dict[str, Any] = {}
+_SERVICE_CACHE: Dict[str, Any] = {}
 
 def get_credentials() -> Credentials:
-    """Get Google Calendar API credentials using OAuth2."""
+    """Get Google Calendar API credentials using OAuth2.
+
+    Credentials are memoized per token-file mtime, so repeated calls skip the
+    disk read until the token file is replaced.
+    """
+    cached = _CREDS_CACHE.get('creds')
     creds = None
 
-    # Load existing token
-    if TOKEN_PATH.exists():
-        creds = Credentials.from_authorized_user_file(str(TOKEN_PATH), SCOPES)
+    # Load existing token (one open; a missing file is the only expected error)
+    try:
+        with open(TOKEN_PATH, 'rb') as fh:
+            token_mtime = os.fstat(fh.fileno()).st_mtime
+            if cached and cached.valid and _CREDS_CACHE.get('mtime') == token_mtime:
+                return cached
+            token_info = json.loads(fh.read())
+        creds = Credentials.from_authorized_user_info(token_info, SCOPES)
+    except FileNotFoundError:
+        token_mtime = None
+
+    previous_token = creds.token if creds else None
 
     # Refresh or create new credentials
     if not creds or not creds.valid:
@@ -45,45 +106,180 @@ def get_credentials() -> Credentials:
             creds.refresh(Request())
         else:
             if not CREDENTIALS_PATH.exists():
-                print(json.dumps({"error": f"Credentials file not found at {CREDENTIALS_PATH}"}), file=sys.stderr)
+                write_json({"error": f"Credentials file not found at {CREDENTIALS_PATH}"}, sys.stderr)
                 sys.exit(1)
 
             flow = InstalledAppFlow.from_client_secrets_file(str(CREDENTIALS_PATH), SCOPES)
             creds = flow.run_local_server(port=0)
 
-        # Save credentials
+    # Save credentials only when the token actually changed (atomic replace)
+    if creds.token != previous_token:
         TOKEN_PATH.parent.mkdir(exist_ok=True)
-        with open(TOKEN_PATH, 'w') as token:
+        tmp_path = TOKEN_PATH.with_name(TOKEN_PATH.name + '.tmp')
+        with open(tmp_path, 'w') as token:
             token.write(creds.to_json())
+        os.replace(tmp_path, TOKEN_PATH)
+        token_mtime = TOKEN_PATH.stat().st_mtime
 
+    _CREDS_CACHE['creds'] = creds
+    _CREDS_CACHE['mtime'] = token_mtime
     return creds
 
-def get_user_email(service) -> str:
-    """Extract user email from the authenticated service."""
+def _shared_http() -> httplib2.Http:
+    """Return the process-wide httplib2 connection, creating it on first use.
+
+    Reusing one Http object keeps the TLS connection to googleapis.com open
+    between requests. No disk cache: responses hold event details and
+    attendee emails, and each day's time window would only add dead entries.
+    """
+    http = _SERVICE_CACHE.get('http')
+    if http is None:
+        http = httplib2.Http()
+        _SERVICE_CACHE['http'] = http
+    return http
+
+def get_service(creds: Credentials):
+    """Build (or reuse) the Calendar API service.
+
+    Uses the discovery document bundled with google-api-python-client, so no
+    HTTPS round-trip is made to fetch it.
+    """
+    service = _SERVICE_CACHE.get('calendar')
+    if service is None or _SERVICE_CACHE.get('creds') is not creds:
+        http = AuthorizedHttp(creds, http=_shared_http())
+        model = OrjsonModel() if orjson is not None else None
+        service = build(
+            'calendar', 'v3',
+            http=http,
+            model=model,
+            cache_discovery=False,
+            static_discovery=True,
+        )
+        _SERVICE_CACHE['calendar'] = service
+        _SERVICE_CACHE['creds'] = creds
+    return service
+
+def _login_fingerprint(creds: Credentials) -> str:
+    """Identify the OAuth login behind creds without storing the refresh token."""
+    return hashlib.sha256((creds.refresh_token or '').encode()).hexdigest()[:16]
+
+def load_cached_profile(creds: Credentials) -> Dict[str, Any] | None:
+    """Return the cached {"email", "tz"} for this client/login, if any."""
     try:
-        calendar = service.calendars().get(calendarId='primary').execute()
-        return calendar.get('id', '')
-    except HttpError:
-        return "user@example.com"  # Fallback
-
-def is_user_invited(event: Dict[str, Any], user_email: str) -> bool:
-    """Check if the user is invited to the event."""
-    attendees = event.get('attendees', [])
+        with open(PROFILE_PATH, 'rb') as fh:
+            profiles = json.loads(fh.read())
+    except (FileNotFoundError, ValueError):
+        return None
+    profile = profiles.get(creds.client_id or '')
+    if profile and profile.get('login') == _login_fingerprint(creds):
+        return profile
+    return None
+
+def save_profile(creds: Credentials, email: str, tz: str) -> None:
+    """Persist the primary calendar's email and timezone, keyed by client_id."""
+    try:
+        with open(PROFILE_PATH, 'rb') as fh:
+            profiles = json.loads(fh.read())
+    except (FileNotFoundError, ValueError):
+        profiles = {}
+    profiles[creds.client_id or ''] = {'email': email, 'tz': tz, 'login': _login_fingerprint(creds)}
+    try:
+        PROFILE_PATH.parent.mkdir(exist_ok=True)
+        tmp_path = PROFILE_PATH.with_name(PROFILE_PATH.name + '.tmp')
+        with open(tmp_path, 'w') as fh:
+            fh.write(json.dumps(profiles))
+        os.replace(tmp_path, PROFILE_PATH)
+    except OSError:
+        pass  # Cache only; the next run will just look it up again
+
+def get_user_email_and_first_page(
+    service,
+    creds: Credentials,
+    events_request,
+) -> tuple[str, Dict[str, Any] | None]:
+    """Resolve the user's email, fetching the first events page alongside it.
+
+    The email comes from the local profile cache when possible (first page is
+    then None and left to the caller). On a miss, `calendars.get('primary')`
+    and `events_request` are sent together as a single batch HTTP request.
+    """
+    profile = load_cached_profile(creds)
+    if profile:
+        return profile['email'], None
+
+    results: Dict[str, tuple] = {}
+
+    def _collect(request_id, response, exception):
+        results[request_id] = (response, exception)
+
+    batch = service.new_batch_http_request(callback=_collect)
+    batch.add(service.calendars().get(calendarId='primary', fields='id,timeZone'), request_id='calendar')
+    batch.add(events_request, request_id='events')
+    batch.execute()
+
+    # Per-request failures arrive as HttpError in the callback
+    calendar, calendar_error = results['calendar']
+    if calendar_error is None:
+        user_email = calendar.get('id', '')
+        save_profile(creds, user_email, calendar.get('timeZone', ''))
+    elif isinstance(calendar_error, HttpError):
+        user_email = "user@example.com"  # Fallback
+    else:
+        raise calendar_error
+
+    first_page, events_error = results['events']
+    if events_error is not None:
+        raise events_error
+    return user_email, first_page
+
+def classify_attendance(attendees: Sequence[Dict[str, Any]], user_email_lc: str) -> tuple[bool, bool]:
+    """Return (invited, declined) for the user in a single pass over attendees.
+
+    `user_email_lc` must already be lowercased. An event without an attendees
+    list counts as invited.
+    """
     if not attendees:
-        return True  # No attendees list means include the event
+        return True, False  # No attendees list means include the event
 
     for attendee in attendees:
-        if attendee.get('email', '').lower() == user_email.lower():
-            return True
-    return False
+        if attendee.get('email', '').lower() == user_email_lc:
+            return True, attendee.get('responseStatus') == 'declined'
+    return False, False
 
-def has_user_declined(event: Dict[str, Any], user_email: str) -> bool:
-    """Check if the user has declined the event."""
-    attendees = event.get('attendees', [])
-    for attendee in attendees:
-        if attendee.get('email', '').lower() == user_email.lower():
-            return attendee.get('responseStatus') == 'declined'
-    return False
+def _parse_rfc3339(s: str) -> datetime:
+    """Parse an RFC3339 timestamp as returned by the Calendar API.
+
+    Slices the fixed YYYY-MM-DDTHH:MM:SS[.ffffff](Z|±HH:MM) layout by index
+    instead of going through the general-purpose ISO parser.
+    """
+    n = len(s)
+    if n < 19 or s[10] != 'T':
+        raise ValueError(f"Invalid RFC3339 datetime: '{s}'")
+
+    # Offset: trailing 'Z', '±HH:MM', or none (naive)
+    if s[-1] in 'Zz':
+        tz = timezone.utc
+        end = n - 1
+    elif n >= 25 and s[-6] in '+-':
+        offset = timedelta(hours=int(s[-5:-3]), minutes=int(s[-2:]))
+        tz = timezone(-offset if s[-6] == '-' else offset)
+        end = n - 6
+    else:
+        tz = None
+        end = n
+
+    # Optional fractional seconds, truncated/padded to microseconds
+    micro = 0
+    if end > 19:
+        if s[19] != '.':
+            raise ValueError(f"Invalid RFC3339 datetime: '{s}'")
+        micro = int(s[20:end][:6].ljust(6, '0'))
+
+    return datetime(
+        int(s[0:4]), int(s[5:7]), int(s[8:10]),
+        int(s[11:13]), int(s[14:16]), int(s[17:19]),
+        micro, tz,
+    )
 
 def format_datetime(dt_str: str) -> tuple[str, str]:
     """Format datetime string to date and time components."""
@@ -93,16 +289,14 @@ def format_datetime(dt_str: str) -> tuple[str, str]:
     try:
         if 'T' in dt_str:
             # Parse full datetime
-            if dt_str.endswith('Z'):
-                dt = datetime.fromisoformat(dt_str[:-1] + '+00:00')
-            else:
-                dt = datetime.fromisoformat(dt_str)
+            dt = _parse_rfc3339(dt_str)
 
             # Convert to local timezone
             if dt.tzinfo is not None:
                 dt = dt.astimezone()
 
-            return dt.strftime('%Y-%m-%d'), dt.strftime('%H:%M:%S')
+            iso = dt.isoformat()
+            return iso[0:10], iso[11:19]
         else:
             # Date-only (all-day event)
             return dt_str, '00:00:00'
@@ -118,7 +312,7 @@ def parse_datetime_param(value: str, is_start: bool) -> datetime:
     If no timezone is provided, assume local timezone, then convert to UTC.
     For date-only: start → 00:00:00, end → 23:59:59.999999 local, then convert to UTC.
     """
-    local_tz = datetime.now().astimezone().tzinfo
+    local_tz = _LOCAL_TZ
     v = value.strip()
     # Date-only
     if 'T' not in v:
@@ -141,9 +335,16 @@ def parse_datetime_param(value: str, is_start: bool) -> datetime:
         dt = dt.replace(tzinfo=local_tz)
     return dt.astimezone(timezone.utc)
 
-def get_accepted_attendees(event: Dict[str, Any]) -> List[str]:
+def format_rfc3339_utc(dt: datetime) -> str:
+    """Format a UTC datetime as RFC3339 with a 'Z' suffix (keeps microseconds if set)."""
+    frac = f".{dt.microsecond:06d}" if dt.microsecond else ''
+    return (
+        f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d}"
+        f"T{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}{frac}Z"
+    )
+
+def get_accepted_attendees(attendees: Sequence[Dict[str, Any]]) -> List[str]:
     """Get list of attendees who have accepted the event."""
-    attendees = event.get('attendees', [])
     if not attendees:
         return []
 
@@ -157,6 +358,107 @@ def get_accepted_attendees(event: Dict[str, Any]) -> List[str]:
 
     return accepted
 
+def build_events_request(service, **list_kwargs):
+    """Build the first-page events.list request with paging and field mask."""
+    return service.events().list(maxResults=MAX_RESULTS_PER_PAGE, fields=EVENT_FIELDS, **list_kwargs)
+
+def iter_events(service, request, response: Dict[str, Any] | None = None) -> Iterator[Dict[str, Any]]:
+    """Yield raw events across all result pages, starting from `request`.
+
+    If `response` is given it is used as the already-fetched first page.
+    The next page is fetched on a worker thread while the caller consumes
+    the current one; only one request is ever in flight, so the shared
+    httplib2 connection is never used concurrently.
+    """
+    events_api = service.events()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pending = None if response is not None else pool.submit(request.execute)
+        while request is not None:
+            if pending is not None:
+                response = pending.result()
+            next_request = events_api.list_next(request, response)
+            pending = pool.submit(next_request.execute) if next_request is not None else None
+            yield from response.get('items', ())
+            request = next_request
+
+def _format_event(
+    event: Dict[str, Any],
+    user_email_lc: str,
+    now_utc: datetime,
+    _classify=classify_attendance,
+    _accepted=get_accepted_attendees,
+    _parse=_parse_rfc3339,
+    _format_dt=format_datetime,
+    _strptime=datetime.strptime,
+    _utc=timezone.utc,
+) -> Dict[str, Any] | None:
+    """Convert one raw event to output format, or return None to skip it.
+
+    Module-level helpers are bound as default arguments so the hot loop
+    resolves them as fast locals rather than globals.
+    """
+    get = event.get
+
+    # Cheapest checks first: event type, status, then start presence
+    if get('eventType') == 'workingLocation':
+        return None
+    if get('status') == 'cancelled':
+        return None
+    start = get('start')
+    if not start:
+        return None
+
+    end = get('end') or {}
+    attendees = get('attendees') or ()
+
+    # Check if user is invited
+    invited, declined = _classify(attendees, user_email_lc)
+    if not invited:
+        return None
+
+    start_timed = start.get('dateTime')
+    start_str = start_timed or start.get('date')
+
+    # Check if user declined (for future events)
+    if declined and start_str:
+        try:
+            # Aware datetimes compare by instant, so no local conversion needed
+            if 'T' in start_str:
+                event_dt = _parse(start_str)
+                if event_dt.tzinfo is None:
+                    event_dt = event_dt.replace(tzinfo=_utc)
+            else:
+                event_dt = _strptime(start_str, '%Y-%m-%d').replace(tzinfo=_utc)
+
+            # Skip if declined and in future
+            if event_dt > now_utc:
+                return None
+        except ValueError:
+            pass
+
+    # Format event
+    start_date, start_time = _format_dt(start_str)
+    end_date, end_time = _format_dt(end.get('dateTime') or end.get('date'))
+
+    # Handle all-day events
+    if start_str and not start_timed:
+        start_time = '00:00:00'
+        end_time = '23:59:59'
+
+    return {
+        'date': start_date,
+        'start_time': start_time,
+        'end_time': end_time,
+        'title': get('summary', 'No Title'),
+        'accepted_attendees': _accepted(attendees),
+        'event_id': get('id', ''),
+        'location': get('location', ''),
+        'description': get('description', ''),
+        'organizer': (get('organizer') or {}).get('email', ''),
+        'status': get('status', ''),
+        'html_link': get('htmlLink', '')
+    }
+
 def fetch_today_events(
     date_str: str | None = None,
     start_param: str | None = None,
@@ -172,8 +474,7 @@ def fetch_today_events(
     """
     try:
         creds = get_credentials()
-        service = build('calendar', 'v3', credentials=creds)
-        user_email = get_user_email(service)
+        service = get_service(creds)
 
         # Determine time window (UTC RFC3339)
         if date_str and (start_param or end_param):
@@ -193,88 +494,29 @@ def fetch_today_events(
             start_dt_utc = parse_datetime_param(base_date, is_start=True)
             end_dt_utc = parse_datetime_param(base_date, is_start=False)
 
-        time_min = start_dt_utc.isoformat().replace('+00:00', 'Z')
-        time_max = end_dt_utc.isoformat().replace('+00:00', 'Z')
+        time_min = format_rfc3339_utc(start_dt_utc)
+        time_max = format_rfc3339_utc(end_dt_utc)
 
-        if debug:
-            print(f"[debug] user={user_email} calendar={calendar_id}", file=sys.stderr)
-            print(f"[debug] timeMin={time_min} timeMax={time_max}", file=sys.stderr)
-
-        # Fetch events
-        events_result = service.events().list(
+        events_request = build_events_request(
+            service,
             calendarId=calendar_id,
             timeMin=time_min,
             timeMax=time_max,
             singleEvents=True,
-            orderBy='startTime'
-        ).execute()
-
-        events = events_result.get('items', [])
-        filtered_events = []
-        now = datetime.now().astimezone()
-
-        for event in events:
-            # Skip workingLocation events
-            if event.get('eventType') == 'workingLocation':
-                continue
-
-            # Check if user is invited
-            if not is_user_invited(event, user_email):
-                continue
-
-            # Check if user declined (for future events)
-            event_start = event.get('start', {})
-            start_time_str = event_start.get('dateTime') or event_start.get('date')
-
-            if start_time_str:
-                try:
-                    if 'T' in start_time_str:
-                        if start_time_str.endswith('Z'):
-                            event_dt = datetime.fromisoformat(start_time_str[:-1] + '+00:00')
-                        else:
-                            event_dt = datetime.fromisoformat(start_time_str)
-                        if event_dt.tzinfo is not None:
-                            event_dt = event_dt.astimezone()
-                        else:
-                            event_dt = event_dt.replace(tzinfo=timezone.utc).astimezone()
-                    else:
-                        event_dt = datetime.strptime(start_time_str, '%Y-%m-%d')
-                        event_dt = event_dt.replace(tzinfo=timezone.utc).astimezone()
-
-                    # Skip if declined and in future
-                    if event_dt > now and has_user_declined(event, user_email):
-                        continue
-                except ValueError:
-                    pass
-
-            # Format event
-            start = event.get('start', {})
-            end = event.get('end', {})
-
-            start_date, start_time = format_datetime(start.get('dateTime') or start.get('date'))
-            end_date, end_time = format_datetime(end.get('dateTime') or end.get('date'))
-
-            # Handle all-day events
-            if not start_time or start_time == '00:00:00':
-                if start.get('date'):
-                    start_time = '00:00:00'
-                    end_time = '23:59:59'
-
-            formatted_event = {
-                'date': start_date,
-                'start_time': start_time,
-                'end_time': end_time,
-                'title': event.get('summary', 'No Title'),
-                'accepted_attendees': get_accepted_attendees(event),
-                'event_id': event.get('id', ''),
-                'location': event.get('location', ''),
-                'description': event.get('description', ''),
-                'organizer': event.get('organizer', {}).get('email', ''),
-                'status': event.get('status', ''),
-                'html_link': event.get('htmlLink', '')
-            }
-
-            filtered_events.append(formatted_event)
+            orderBy='startTime',
+        )
+        user_email, first_page = get_user_email_and_first_page(service, creds, events_request)
+        user_email_lc = user_email.lower()
+
+        if debug:
+            print(f"[debug] user={user_email} calendar={calendar_id}", file=sys.stderr)
+            print(f"[debug] timeMin={time_min} timeMax={time_max}", file=sys.stderr)
+
+        # Fetch remaining pages and filter events as they stream in
+        events = iter_events(service, events_request, first_page)
+        now_utc = datetime.now(timezone.utc)
+        formatted = (_format_event(event, user_email_lc, now_utc) for event in events)
+        filtered_events = [event for event in formatted if event is not None]
 
         return filtered_events
 
@@ -288,7 +530,7 @@ def main():
     parser.add_argument('--start', dest='start_param', help='Start datetime (ISO-8601 or YYYY-MM-DD)')
     parser.add_argument('--end', dest='end_param', help='End datetime (ISO-8601 or YYYY-MM-DD)')
     parser.add_argument('--calendar-id', default='primary', help='Calendar ID (default: primary)')
-    parser.add_argument('--debug', action='store_true', help='Print debug info to stderr')
+    parser.add_argument('--debug', action='store_true', help='Print debug info to stderr and pretty-print the JSON output')
     args = parser.parse_args()
 
     events = fetch_today_events(
@@ -303,7 +545,8 @@ def main():
         'total_events': len(events),
         'events': events
     }
-    print(json.dumps(output, indent=2, ensure_ascii=False))
+    # Compact JSON for n8n; indented only when debugging by hand
+    write_json(output, sys.stdout, indent=args.debug)
 
 if __name__ == '__main__':
     main()
@@ -16,15 +16,22 @@ from __future__ import annotations
 import argparse
 import datetime as dt
 import email
+import email.parser
 import email.policy
 import hashlib
 import json
 import logging
 import os
+import queue
 import re
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from html import unescape
+from itertools import islice
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional
 
 # --- deps ---
 from imapclient import IMAPClient
@@ -32,6 +39,11 @@ from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 
+try:
+    import orjson  # optional: faster index/state (de)serialization
+except ImportError:
+    orjson = None
+
 # -------------------- Defaults --------------------
 
 # Set your Gmail address here or via environment variable
@@ -59,17 +71,41 @@ LABEL_ALIASES = {
     "Slack Thread": "Slack-Thread",
     "AI/Slack-Thread": "Slack-Thread",
 }
-CANONICAL_LABELS = {"Save", "Slack-Thread"}
+CANONICAL_LABELS = frozenset({"Save", "Slack-Thread"})
+
+FETCH_BATCH = 100  # UIDs per IMAP FETCH; bounds memory and request size
+LARGE_MESSAGE_BYTES = 1_000_000  # bigger messages get their own FETCH
+IMAP_TIMEOUT = 30  # seconds; a stalled FETCH fails instead of hanging the run
+WRITE_WORKERS = 4  # threads parsing messages and writing notes
+SCAN_WORKERS = 16  # threads reading note heads when rebuilding the index
+
+# One parser for both the headers-only and full passes; BytesParser keeps no
+# per-parse state (each parse gets its own FeedParser), so threads can share it
+MSG_PARSER = email.parser.BytesParser(policy=email.policy.default)
+
+# Precompiled patterns (hot paths run these once or more per message)
+_RE_DROP   = re.compile(r"<(head|style|script)[\s\S]*?</\1>", re.I)  # whole non-content blocks
+_RE_BR     = re.compile(r"</?br\s*/?>", re.I)
+_RE_P      = re.compile(r"</?p[^>]*>", re.I)
+_RE_LI     = re.compile(r"</?li[^>]*>", re.I)
+_RE_H      = re.compile(r"</?h([1-6])[^>]*>(.*?)</h\1>", re.I | re.S)
+_RE_TAG    = re.compile(r"<[^>]+>")
+_RE_SLUG_NONWORD = re.compile(r"[^\w\s-]")
+_RE_SLUG_WS      = re.compile(r"\s+")
+_RE_SLUG_DASH    = re.compile(r"-{2,}")
+_RE_SINCE        = re.compile(r"(\d+)([dwmy])", re.I)
+_SINCE_DAYS      = {"d": 1, "w": 7, "m": 30, "y": 365}
 
 # -------------------- Utils --------------------
 
 def slugify(text: str, max_len: int = 80) -> str:
     s = (text or "email").lower()
-    s = re.sub(r"[^\w\s-]", "", s)
-    s = re.sub(r"\s+", "-", s).strip("-")
-    s = re.sub(r"-{2,}", "-", s)
+    s = _RE_SLUG_NONWORD.sub("", s)
+    s = _RE_SLUG_WS.sub("-", s).strip("-")
+    s = _RE_SLUG_DASH.sub("-", s)
     return (s or "email")[:max_len]
 
+@lru_cache(maxsize=4096)
 def decode_words(s: Optional[str]) -> str:
     if not s: return ""
     try:
@@ -96,91 +132,179 @@ def parsedate_to_iso(hdr_date: Optional[str], fallback_dt: Optional[dt.datetime]
 
 def html_to_md_quick(html: str) -> str:
     if not html: return ""
-    s = re.sub(r"<head[\s\S]*?</head>", "", html, flags=re.I)
-    s = re.sub(r"<style[\s\S]*?</style>", "", s, flags=re.I)
-    s = re.sub(r"<script[\s\S]*?</script>", "", s, flags=re.I)
-    s = re.sub(r"</?br\s*/?>", "\n", s, flags=re.I)
-    s = re.sub(r"</?p[^>]*>", "\n\n", s, flags=re.I)
-    s = re.sub(r"</?li[^>]*>", "\n- ", s, flags=re.I)
-    s = re.sub(r"</?h([1-6])[^>]*>(.*?)</h\1>", lambda m: "\n" + ("#"*int(m.group(1))) + " " + m.group(2) + "\n", s, flags=re.I|re.S)
-    s = re.sub(r"<[^>]+>", "", s)
-    return s.replace("&nbsp;"," ").replace("&amp;","&").replace("&lt;","<").replace("&gt;",">").strip()
+    if "<" not in html: return unescape(html).replace("\xa0", " ").strip()
+    s = _RE_DROP.sub("", html)
+    s = _RE_BR.sub("\n", s)
+    s = _RE_P.sub("\n\n", s)
+    s = _RE_LI.sub("\n- ", s)
+    s = _RE_H.sub(lambda m: "\n" + ("#"*int(m.group(1))) + " " + m.group(2) + "\n", s)
+    s = _RE_TAG.sub("", s)
+    return unescape(s).replace("\xa0", " ").strip()
+
+def _decode_text_part(part: email.message.Message) -> str:
+    payload = part.get_payload(decode=True) or b""
+    try:
+        return payload.decode(part.get_content_charset() or "utf-8", "replace")
+    except LookupError:  # unknown charset label
+        return payload.decode("utf-8", "replace")
 
 def body_from_email(msg: email.message.EmailMessage) -> Tuple[str, str]:
     text_plain, text_html = [], []
-    if msg.is_multipart():
-        for part in msg.walk():
-            if part.get_content_disposition() == "attachment": continue
-            ctype = part.get_content_type()
-            if ctype == "text/plain":
-                try: text_plain.append(part.get_content().strip())
-                except Exception:
-                    payload = part.get_payload(decode=True) or b""
-                    text_plain.append(payload.decode(part.get_content_charset() or "utf-8","replace").strip())
-            elif ctype == "text/html":
-                try: text_html.append(part.get_content())
-                except Exception:
-                    payload = part.get_payload(decode=True) or b""
-                    text_html.append(payload.decode(part.get_content_charset() or "utf-8","replace"))
-    else:
-        ctype = msg.get_content_type()
-        if ctype == "text/plain": text_plain.append(msg.get_content().strip())
-        elif ctype == "text/html": text_html.append(msg.get_content())
-    plain = "\n\n".join(x for x in text_plain if x).strip()
-    html  = "\n\n".join(x for x in text_html if x).strip()
+    # walk() recurses into nested multiparts (e.g. mixed → alternative); containers are skipped
+    for part in (msg.walk() if msg.is_multipart() else (msg,)):
+        if part.is_multipart() or part.get_content_disposition() == "attachment": continue
+        ctype = part.get_content_type()
+        if ctype == "text/plain":
+            text = _decode_text_part(part).strip()
+            if text: text_plain.append(text)
+        elif ctype == "text/html":
+            text = _decode_text_part(part)
+            if text: text_html.append(text)
+    plain = "\n\n".join(text_plain).strip()
+    html  = "\n\n".join(text_html).strip()
     if plain: return plain, "plain"
     if html:  return html_to_md_quick(html), "html->md"
     return (msg.as_string()[:40000], "raw")
 
+CHECKSUM_PREFIX = "sha256v2:"       # streaming digest below
+LEGACY_CHECKSUM_PREFIX = "sha256:"  # json.dumps digest written by older versions of this script
+_CHECKSUM_SCALARS = ("subject", "date", "doc_type", "gm_msgid", "gm_thrid", "message_id")
+
 def checksum_for(payload: Dict) -> str:
+    """
+    SHA-256 fed field by field in a fixed order (no intermediate JSON copy of
+    the body). Separators keep field boundaries unambiguous.
+    """
+    h = hashlib.sha256()
+    upd = h.update
+    for k in _CHECKSUM_SCALARS:
+        upd(repr(payload[k]).encode("utf-8")); upd(b"\0")
+    for k in ("from", "to", "cc"):
+        for a in payload[k]:
+            upd(a["name"].encode("utf-8", "surrogatepass")); upd(b"\x1f")
+            upd(a["email"].encode("utf-8", "surrogatepass")); upd(b"\x1e")
+        upd(b"\0")
+    for l in payload["labels"]:
+        upd(l.encode("utf-8", "surrogatepass")); upd(b"\x1e")
+    upd(b"\0")
+    upd(payload["body"].encode("utf-8", "surrogatepass"))
+    return f"{CHECKSUM_PREFIX}{h.hexdigest()}"
+
+def legacy_checksum_for(payload: Dict) -> str:
+    """The json.dumps digest older versions wrote; only used to recognise their notes."""
     h = hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
-    return f"sha256:{h}"
+    return f"{LEGACY_CHECKSUM_PREFIX}{h}"
 
-def read_existing_checksum(md_path: Path) -> Optional[str]:
-    if not md_path.exists(): return None
+NOTE_HEAD_BYTES = 4096  # front-matter lives well within this
+NOTE_HEAD_LINES = 40
+
+def read_note_head(md_path) -> str:
+    """Read and decode the first NOTE_HEAD_BYTES of a note ("" if missing/unreadable)."""
     try:
-        head = md_path.read_text("utf-8")[:4000]
-        m = re.search(r'^\s*checksum:\s*"(sha256:[a-f0-9]+)"\s*$', head, flags=re.M)
-        return m.group(1) if m else None
+        with open(md_path, "rb") as fh:
+            return fh.read(NOTE_HEAD_BYTES).decode("utf-8", "replace")
     except Exception:
-        return None
+        return ""
+
+def parse_note_head(head: str) -> Tuple[Optional[str], Optional[str], Optional[int]]:
+    """
+    Returns (checksum, message_id_without_angles, x_gm_msgid_int) from a note's
+    YAML front-matter in one line scan; missing fields are None.
+    """
+    checksum = msgid = gm = None
+    for i, line in enumerate(head.splitlines()[:NOTE_HEAD_LINES]):
+        line = line.strip()
+        if line == "---":
+            if i: break  # end of front-matter
+            continue
+        if checksum is None and line.startswith("checksum:"):
+            val = line[9:].strip()
+            if len(val) > 9 and val[0] == '"' and val[-1] == '"' and val[1:].startswith((CHECKSUM_PREFIX, LEGACY_CHECKSUM_PREFIX)):
+                checksum = val[1:-1]
+        elif msgid is None and line.startswith("message_id:"):
+            # message_id: "<...>"
+            val = line[11:].strip().strip('"').strip("<>").strip()
+            if val: msgid = val
+        elif gm is None and line.startswith("x_gm_msgid:"):
+            # x_gm_msgid: "12345"
+            val = line[11:].strip().strip('"')
+            if val.isdigit(): gm = int(val)
+    return (checksum, msgid, gm)
 
-def extract_ids_from_file_head(md_path: Path) -> Tuple[Optional[str], Optional[int]]:
+def read_existing_checksum(md_path: Path) -> Optional[str]:
+    return parse_note_head(read_note_head(md_path))[0]
+
+def parse_note_labels(head: str) -> Optional[List[str]]:
+    """The `labels:` list from a note's YAML front-matter, in the order written."""
+    for line in head.splitlines()[1:NOTE_HEAD_LINES]:
+        if line.startswith("---"): break
+        if line.startswith("labels:"):
+            try: return json.loads(line[7:])
+            except ValueError: return None
+    return None
+
+def legacy_checksum_matches(md_path: Path, payload: Dict, on_disk: str) -> bool:
+    """
+    True if a note carrying a legacy checksum was written from this exact payload.
+    Old versions kept Gmail's label order, so the note's own labels: line supplies it.
+    """
+    labels = parse_note_labels(read_note_head(md_path))
+    if labels is None or sorted(labels) != sorted(payload["labels"]):
+        return False
+    return legacy_checksum_for(dict(payload, labels=labels)) == on_disk
+
+def upgrade_checksum(md_path: Path, old: str, new: str) -> None:
+    """Swap a note's front-matter checksum in place, leaving the rest of the file untouched."""
+    with open(md_path, "rb") as fh:
+        data = fh.read()
+    line = f'checksum: "{old}"'.encode()
+    if line in data:
+        write_note(md_path, data.replace(line, f'checksum: "{new}"'.encode(), 1))
+
+def extract_ids_from_file_head(head: str) -> Tuple[Optional[str], Optional[int]]:
     """
     Returns (message_id_string_without_angles, x_gm_msgid_int) if found in YAML front-matter head.
     """
-    try:
-        head = md_path.read_text("utf-8")[:4000]
-    except Exception:
-        return (None, None)
-    msgid = None
-    # message_id: "<...>"
-    m1 = re.search(r'^\s*message_id:\s*"?<?([^">\n]+)>?"?\s*$', head, flags=re.M)
-    if m1: msgid = m1.group(1).strip()
-    # x_gm_msgid: "12345"
-    m2 = re.search(r'^\s*x_gm_msgid:\s*"?(\d+)"?\s*$', head, flags=re.M)
-    gm = int(m2.group(1)) if m2 else None
+    _, msgid, gm = parse_note_head(head)
     return (msgid, gm)
 
-def canonicalize_labels(labels: List[str]) -> List[str]:
-    out = []
-    for lbl in labels:
-        l = LABEL_ALIASES.get(lbl.strip(), lbl.strip())
-        if l not in out: out.append(l)
-    return out
+def canonicalize_labels(labels: Iterable[str]) -> frozenset:
+    return frozenset(LABEL_ALIASES.get(lbl.strip(), lbl.strip()) for lbl in labels)
 
-def wants_processing(labels: List[str]) -> bool:
+def wants_processing(labels: frozenset) -> bool:
     """
     Renamed from wants_embedding to wants_processing since we're not embedding.
     Checks for 'Save' and 'Slack-Thread' labels to determine if email should be processed.
     """
-    return any(l in ("Save", "Slack-Thread") for l in labels)
+    return not CANONICAL_LABELS.isdisjoint(labels)
 
-def infer_doc_type(labels: List[str]) -> str:
+def infer_doc_type(labels: frozenset) -> str:
     return "slack" if "Slack-Thread" in labels else "email"
 
+_MADE_DIRS: set = set()  # parents already created this run (many notes share Emails/YYYY/QN)
+
 def ensure_dirs(p: Path):
-    p.parent.mkdir(parents=True, exist_ok=True)
+    parent = p.parent
+    if parent not in _MADE_DIRS:
+        parent.mkdir(parents=True, exist_ok=True)
+        _MADE_DIRS.add(parent)
+
+def write_note(p: Path, data: bytes) -> None:
+    """Write a note with raw os.open/os.write — no text wrapper or encoder layers."""
+    fd = os.open(p, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+
+def batched(items: Iterable, n: int) -> Iterator[List]:
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, n))
+        if not chunk: return
+        yield chunk
 
 # -------------------- OAuth / IMAP auth --------------------
 
@@ -207,49 +331,114 @@ def imap_oauth2_login(server: IMAPClient, user_email: str, creds: Credentials):
         auth_string = f"user={user_email}\1auth=Bearer {token}\1\1"
         server._imap.authenticate("XOAUTH2", lambda x: auth_string)
 
+def iter_fetched(srv: IMAPClient, uids: List[int], fetch_keys: List[bytes], batch_size: int = FETCH_BATCH) -> Iterator[Tuple[int, Dict]]:
+    """
+    FETCH uids in batches, yielding (uid, data) in uid order.
+    Metadata (incl. RFC822.SIZE) for every uid comes in one FETCH up front; bodies of
+    ordinary messages are then fetched once per batch, while messages over
+    LARGE_MESSAGE_BYTES are fetched one at a time so a batch of big newsletters
+    never sits in a single response.
+    """
+    body_keys = [k for k in fetch_keys if k.startswith(b"BODY")]
+    meta_keys = [k for k in fetch_keys if k not in body_keys]
+    if b"RFC822.SIZE" not in meta_keys: meta_keys.append(b"RFC822.SIZE")
+    meta = srv.fetch(uids, meta_keys) if uids else {}
+    for batch in batched(uids, batch_size):
+        small = [uid for uid in batch if (meta.get(uid) or {}).get(b"RFC822.SIZE", 0) <= LARGE_MESSAGE_BYTES]
+        bodies = srv.fetch(small, body_keys) if small else {}
+        for uid in batch:
+            data = meta.get(uid) or {}
+            body = bodies.get(uid) if uid in bodies else srv.fetch([uid], body_keys).get(uid)
+            if body: data.update(body)
+            yield uid, data
+
 # -------------------- Dedupe index --------------------
 
+def json_load_file(path: Path):
+    raw = path.read_bytes()
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+def json_save_file(path: Path, data) -> None:
+    """Write data as indented JSON via temp file + os.replace (atomic)."""
+    if orjson is not None:
+        raw = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    else:
+        raw = json.dumps(data, indent=2).encode("utf-8")
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(raw)
+    os.replace(tmp, path)
+
 def load_index(path: Path) -> Dict:
+    """
+    Index layout: by_gm_msgid / by_message_id map ids → note path; notes maps
+    path → {"checksum", "mtime_ns", "size"} as of our last write/verify.
+    """
     if not path.exists():
-        return {"by_gm_msgid": {}, "by_message_id": {}}
+        return {"by_gm_msgid": {}, "by_message_id": {}, "notes": {}}
     try:
-        data = json.loads(path.read_text("utf-8"))
+        data = json_load_file(path)
         data.setdefault("by_gm_msgid", {})
         data.setdefault("by_message_id", {})
+        data.setdefault("notes", {})
         return data
     except Exception:
-        return {"by_gm_msgid": {}, "by_message_id": {}}
+        return {"by_gm_msgid": {}, "by_message_id": {}, "notes": {}}
+
+def note_stat_matches(entry: Optional[Dict], st: Optional[os.stat_result], checksum: str) -> bool:
+    """True if the note is unchanged since we recorded `entry` and carries `checksum`."""
+    return bool(entry and st
+                and entry.get("mtime_ns") == st.st_mtime_ns
+                and entry.get("size") == st.st_size
+                and entry.get("checksum") == checksum)
 
 def save_index(path: Path, data: Dict):
     try:
-        path.write_text(json.dumps(data, indent=2), encoding="utf-8")
+        json_save_file(path, data)
     except Exception as e:
         logging.warning("Failed to save dedupe index: %s", e)
 
+def _iter_md(base: str) -> Iterator[str]:
+    """Yield paths of all *.md files under base (os.scandir; no symlink following)."""
+    try:
+        it = os.scandir(base)
+    except OSError:
+        return
+    with it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_md(entry.path)
+            elif entry.name.endswith(".md"):
+                yield entry.path
+
+def _read_head_ids(path: str) -> Tuple[Optional[str], Optional[int]]:
+    return extract_ids_from_file_head(read_note_head(path))
+
 def scan_recent_for_existing(vault_root: Path, years_back: int = 3) -> Dict:
     """
     Lightweight scan of recent Emails to rebuild a minimal id→path map.
     Scans both old structure (year/month/day) and new structure (year/quarter).
+    Note heads are read in parallel; the work is small reads, i.e. I/O-bound.
     """
     base = vault_root / EMAILS_DIR
     now_y = dt.datetime.now().year
-    found = {}
-    for y in range(now_y, now_y - years_back, -1):
-        ydir = base / str(y)
-        if not ydir.exists(): continue
-        for md in ydir.rglob("*.md"):
-            mid, gmid = extract_ids_from_file_head(md)
-            if mid:  found.setdefault("by_message_id", {})[mid] = str(md)
-            if gmid: found.setdefault("by_gm_msgid", {})[str(gmid)] = str(md)
-    return {"by_gm_msgid": found.get("by_gm_msgid", {}), "by_message_id": found.get("by_message_id", {})}
+    paths = [md for y in range(now_y, now_y - years_back, -1) for md in _iter_md(str(base / str(y)))]
+    by_msgid, by_gmid = {}, {}
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as ex:
+        for md, (mid, gmid) in zip(paths, ex.map(_read_head_ids, paths)):
+            if mid:  by_msgid[mid] = md
+            if gmid: by_gmid[str(gmid)] = md
+    return {"by_gm_msgid": by_gmid, "by_message_id": by_msgid}
 
 # -------------------- Build Markdown --------------------
 
+_EMPTY_ADDR = {"name": "", "email": ""}  # front-matter "from" when the header is missing
+_QMAP = ("Q1", "Q1", "Q1", "Q2", "Q2", "Q2", "Q3", "Q3", "Q3", "Q4", "Q4", "Q4")  # month-1 → quarter
+
 def build_markdown(
     *,
     vault_root: Path,
     msg: email.message.EmailMessage,
-    gm_labels: List[str],
+    gm_labels: Iterable[str],
     gm_msgid: Optional[int],
     gm_thrid: Optional[int],
     internaldate: Optional[dt.datetime],
@@ -267,13 +456,12 @@ def build_markdown(
 
     canon_labels = canonicalize_labels(gm_labels)
     doc_type = infer_doc_type(canon_labels)
+    label_list = sorted(canon_labels)  # stable order for checksum + front matter
 
     d_local = dt.datetime.fromisoformat(date_iso.replace("Z", "+00:00")).astimezone()
     y, m, d_ = d_local.year, d_local.month, f"{d_local.day:02d}"
 
-    # Calculate quarter based on month
-    quarter = (m - 1) // 3 + 1
-    quarter_str = f"Q{quarter}{str(y)[-2:]}"  # e.g., Q425 for Q4 2025
+    quarter_str = f"{_QMAP[m - 1]}{y % 100:02d}"  # e.g., Q425 for Q4 2025
 
     slug = slugify(subject)
     short = (str(gm_msgid) if gm_msgid else hashlib.md5((message_id or subject).encode()).hexdigest())[-6:]
@@ -290,7 +478,7 @@ def build_markdown(
         "to": to_list,
         "cc": cc_list,
         "date": date_iso,
-        "labels": canon_labels,
+        "labels": label_list,
         "body": body_md[:200000],
         "doc_type": doc_type,
         "gm_msgid": gm_msgid,
@@ -308,11 +496,11 @@ def build_markdown(
         f"  x_gm_thrid: \"{gm_thrid or ''}\"",
         f"  message_id: \"{message_id}\"",
         f"subject: {json.dumps(subject)}",
-        f"from: {json.dumps(from_list[0] if from_list else {'name':'','email':''})}",
+        f"from: {json.dumps(from_list[0] if from_list else _EMPTY_ADDR)}",
         f"to: {json.dumps(to_list)}",
         f"cc: {json.dumps(cc_list)}",
         f"date: {date_iso}",
-        f"labels: {json.dumps(canon_labels)}",
+        f"labels: {json.dumps(label_list)}",
         "attachments: []",
         f"checksum: \"{checksum}\"",
         f"ingested_at: {dt.datetime.now(dt.timezone.utc).isoformat()}",
@@ -320,12 +508,13 @@ def build_markdown(
         "---",
         "",
     ]
-    md = "".join(line + ("\n" if not line.endswith("\n") else "") for line in yaml) + body_md + "\n"
+    md = "\n".join(yaml) + "\n" + body_md + "\n"
 
     meta = {
         "path_abs": str(abs_path),
         "path_rel": str(rel_path),
         "checksum": checksum,
+        "checksum_payload": payload_for_checksum,
         "doc_type": doc_type,
         "message_id": message_id,
         "x_gm_msgid": str(gm_msgid) if gm_msgid else None,
@@ -338,10 +527,10 @@ def gmail_label_query(labels: List[str], since: Optional[str]) -> str:
     parts = []
     if labels: parts.append("(" + " OR ".join([f'label:\"{l}\"' for l in labels]) + ")")
     if since:
-        rel = re.fullmatch(r"(\d+)([dwmy])", since.strip(), flags=re.I)
+        rel = _RE_SINCE.fullmatch(since.strip())
         if rel:
             num, unit = int(rel.group(1)), rel.group(2).lower()
-            days = num * {"d":1, "w":7, "m":30, "y":365}[unit]
+            days = num * _SINCE_DAYS[unit]
             cutoff = (dt.datetime.utcnow() - dt.timedelta(days=days)).date().strftime("%Y/%m/%d")
             parts.append(f"after:{cutoff}")
         else:
@@ -356,6 +545,7 @@ def main():
     ap.add_argument("--labels", nargs="+", default=["Save"])
     ap.add_argument("--since", default=None)
     ap.add_argument("--max", type=int, default=500)
+    ap.add_argument("--workers", type=int, default=WRITE_WORKERS)
     # REMOVED: --no-embed and --embed-cmd options - embedding is never done
     ap.add_argument("--dry-run", action="store_true")
     ap.add_argument("--state-file", default=STATE_FILE)              # kept for compat
@@ -384,7 +574,7 @@ def main():
     # legacy state (still loaded/written for back-compat)
     state_path = (vault_root / args.state_file) if not os.path.isabs(args.state_file) else Path(args.state_file)
     try:
-        legacy_state = json.loads(state_path.read_text("utf-8")) if state_path.exists() else {}
+        legacy_state = json_load_file(state_path) if state_path.exists() else {}
     except Exception:
         legacy_state = {}
 
@@ -392,13 +582,16 @@ def main():
     index_path = (vault_root / args.index_file) if not os.path.isabs(args.index_file) else Path(args.index_file)
     index = load_index(index_path)
 
-    # opportunistic repair of index (fast scan of recent years)
+    # opportunistic repair of index (fast scan of recent years); the scan runs
+    # at most once per process — later index misses reuse its result
+    recent_scanned = False
     if not index["by_gm_msgid"] and not index["by_message_id"]:
         logging.info("Dedupe index empty; scanning recent notes to seed it…")
         seeded = scan_recent_for_existing(vault_root, years_back=3)
         # merge
         index["by_gm_msgid"].update(seeded["by_gm_msgid"])
         index["by_message_id"].update(seeded["by_message_id"])
+        recent_scanned = True
 
     client_path = Path(args.oauth_client).expanduser().resolve()
     token_path  = Path(args.oauth_token).expanduser().resolve()
@@ -407,7 +600,7 @@ def main():
     query = gmail_label_query(args.labels, args.since)
     logging.info("Gmail raw query: %s", query)
 
-    with IMAPClient(args.imap_host, port=args.imap_port, ssl=args.imap_ssl) as srv:
+    with IMAPClient(args.imap_host, port=args.imap_port, ssl=args.imap_ssl, timeout=IMAP_TIMEOUT) as srv:
         imap_oauth2_login(srv, user_email, creds)
 
         folder = "[Gmail]/All Mail"
@@ -421,107 +614,201 @@ def main():
 
         uids = list(sorted(uids, reverse=True))[: args.max]
         fetch_keys = [b"BODY[]", b"ENVELOPE", b"X-GM-LABELS", b"X-GM-THRID", b"X-GM-MSGID", b"INTERNALDATE", b"RFC822.SIZE"]
-        resp = srv.fetch(uids, fetch_keys)
 
+        # Pipeline: this thread FETCHes batches (IMAP stays single-threaded) while
+        # worker threads parse, build markdown and write notes.
+        work: "queue.Queue[Optional[Tuple[int, Dict]]]" = queue.Queue(maxsize=FETCH_BATCH * 2)
+        state_lock = threading.Lock()        # guards index, legacy_state, processed
+        index_updated = threading.Event()
         processed = 0
-        index_updated = False
+        key_locks: Dict[str, threading.Lock] = {}
 
-        for uid in uids:
-            data = resp.get(uid) or {}
+        def dedupe_lock(key: str) -> threading.Lock:
+            with state_lock:
+                return key_locks.setdefault(key, threading.Lock())
+
+        def handle(uid: int, data: Dict) -> bool:
+            nonlocal recent_scanned
             raw = data.get(b"BODY[]") or data.get(b"RFC822")
             if not raw:
-                logging.warning("No BODY for UID %s; skipping.", uid); continue
-
-            try:
-                msg: email.message.EmailMessage = email.message_from_bytes(raw, policy=email.policy.default)
-            except Exception as e:
-                logging.warning("Parse error UID %s: %s", uid, e); continue
+                logging.warning("No BODY for UID %s; skipping.", uid); return False
 
             gm_labels = [lbl.decode() if isinstance(lbl, bytes) else lbl for lbl in (data.get(b"X-GM-LABELS") or [])]
             gm_msgid  = int(data.get(b"X-GM-MSGID")) if data.get(b"X-GM-MSGID") else None
             gm_thrid  = int(data.get(b"X-GM-THRID")) if data.get(b"X-GM-THRID") else None
             internal  = data.get(b"INTERNALDATE")
             internal_dt = internal if isinstance(internal, dt.datetime) else None
+            msg_size  = data.get(b"RFC822.SIZE")
 
             canon_labels = canonicalize_labels(gm_labels)
             if not wants_processing(canon_labels):  # renamed from wants_embedding
                 logging.debug("Skip UID %s (no canonical processing labels)", uid)
-                continue
+                return False
+            label_list = sorted(canon_labels)
+
+            # Phase 1: headers only — enough to dedupe without decoding the body
+            try:
+                headers = MSG_PARSER.parsebytes(raw, headersonly=True)
+            except Exception as e:
+                logging.warning("Parse error UID %s: %s", uid, e); return False
 
             # ---------- DEDUPE: find existing note path (index → legacy → scan) ----------
-            message_id = (msg.get("Message-Id") or msg.get("Message-ID") or "").strip().strip("<>")
-            existing_path: Optional[Path] = None
-
-            if gm_msgid and str(gm_msgid) in index["by_gm_msgid"]:
-                existing_path = Path(index["by_gm_msgid"][str(gm_msgid)])
-            elif message_id and message_id in index["by_message_id"]:
-                existing_path = Path(index["by_message_id"][message_id])
-            else:
-                # fallback scan (cheap head parse) to repair index
-                seeded = scan_recent_for_existing(vault_root, years_back=3)
-                index["by_gm_msgid"].update(seeded["by_gm_msgid"])
-                index["by_message_id"].update(seeded["by_message_id"])
-                index_updated = True
-                if gm_msgid and str(gm_msgid) in index["by_gm_msgid"]:
-                    existing_path = Path(index["by_gm_msgid"][str(gm_msgid)])
-                elif message_id and message_id in index["by_message_id"]:
-                    existing_path = Path(index["by_message_id"][message_id])
-
-            # Build markdown & default target path (used if no existing)
-            abs_path, md, meta = build_markdown(
-                vault_root=vault_root,
-                msg=msg,
-                gm_labels=canon_labels,
-                gm_msgid=gm_msgid,
-                gm_thrid=gm_thrid,
-                internaldate=internal_dt,
-            )
-
-            # If we already have a file for this message, use that path instead
-            target_path = existing_path if existing_path else abs_path
-
-            existing_checksum = read_existing_checksum(target_path)
-            if existing_checksum == meta["checksum"]:
-                # No changes — truly skip (no re-import)
-                logging.info("Duplicate/no-change: %s", target_path)
-            else:
-                action = "Update" if target_path.exists() else "Write"
-                logging.info(("%s (deduped): " if existing_path else "%s: ") % action + "%s", target_path)
-                if not args.dry_run:
-                    ensure_dirs(target_path)
-                    target_path.write_text(md, encoding="utf-8")
-
-            # Update indices (path + checksum) after write/skip
-            key = str(gm_msgid) if gm_msgid else None
-            if key:
-                if index["by_gm_msgid"].get(key) != str(target_path):
-                    index["by_gm_msgid"][key] = str(target_path); index_updated = True
-            if message_id:
-                if index["by_message_id"].get(message_id) != str(target_path):
-                    index["by_message_id"][message_id] = str(target_path); index_updated = True
-
-            # maintain legacy state for compat (optional)
-            legacy_key = str(gm_msgid or uid)
-            legacy_entry = legacy_state.get(legacy_key)
-            if (not legacy_entry) or (legacy_entry.get("checksum") != meta["checksum"]) or (legacy_entry.get("path") != str(target_path.relative_to(vault_root))):
-                legacy_state[legacy_key] = {
-                    "path": str(target_path.relative_to(vault_root)),
-                    "checksum": meta["checksum"],
-                    "type": meta["doc_type"],
-                }
+            message_id = (headers.get("Message-Id") or headers.get("Message-ID") or "").strip().strip("<>")
+
+            # Hold the message's dedupe key from index lookup through index update, so
+            # two workers seeing copies of one Message-ID can't both miss and both write
+            with dedupe_lock(message_id or f"gm:{gm_msgid or uid}"):
+                existing_path: Optional[Path] = None
+
+                with state_lock:
+                    if gm_msgid and str(gm_msgid) in index["by_gm_msgid"]:
+                        existing_path = Path(index["by_gm_msgid"][str(gm_msgid)])
+                    elif message_id and message_id in index["by_message_id"]:
+                        existing_path = Path(index["by_message_id"][message_id])
+                    elif not recent_scanned:
+                        # fallback scan (cheap head parse) to repair index — first miss only
+                        seeded = scan_recent_for_existing(vault_root, years_back=3)
+                        index["by_gm_msgid"].update(seeded["by_gm_msgid"])
+                        index["by_message_id"].update(seeded["by_message_id"])
+                        index_updated.set()
+                        recent_scanned = True
+                        if gm_msgid and str(gm_msgid) in index["by_gm_msgid"]:
+                            existing_path = Path(index["by_gm_msgid"][str(gm_msgid)])
+                        elif message_id and message_id in index["by_message_id"]:
+                            existing_path = Path(index["by_message_id"][message_id])
+                    note_entry = index["notes"].get(str(existing_path)) if existing_path else None
+
+                # Steady state: the note was written from this same Gmail message (immutable)
+                # with the same labels and is untouched → skip the full MIME parse entirely.
+                st: Optional[os.stat_result] = None
+                if (note_entry and gm_msgid and note_entry.get("gm_msgid") == gm_msgid
+                        and note_entry.get("msg_size") == msg_size
+                        and note_entry.get("labels") == label_list):
+                    try: st = os.stat(existing_path)
+                    except OSError: st = None
+                if note_stat_matches(note_entry, st, note_entry and note_entry.get("checksum")):
+                    target_path = existing_path
+                    checksum, doc_type = note_entry["checksum"], infer_doc_type(canon_labels)
+                    unchanged, wrote = True, False
+                    logging.info("Duplicate/no-change: %s", target_path)
+                else:
+                    # Phase 2: full parse + markdown
+                    try:
+                        msg: email.message.EmailMessage = MSG_PARSER.parsebytes(raw)
+                    except Exception as e:
+                        logging.warning("Parse error UID %s: %s", uid, e); return False
+
+                    # Build markdown & default target path (used if no existing)
+                    abs_path, md, meta = build_markdown(
+                        vault_root=vault_root,
+                        msg=msg,
+                        gm_labels=canon_labels,
+                        gm_msgid=gm_msgid,
+                        gm_thrid=gm_thrid,
+                        internaldate=internal_dt,
+                    )
+                    checksum, doc_type = meta["checksum"], meta["doc_type"]
+
+                    # If we already have a file for this message, use that path instead
+                    target_path = existing_path if existing_path else abs_path
+
+                    # stat first: if size/mtime match what we recorded, skip reading the note
+                    try:
+                        st = os.stat(target_path)
+                    except OSError:
+                        st = None
+                    with state_lock:
+                        note_entry = index["notes"].get(str(target_path))
+
+                    on_disk = None
+                    if note_stat_matches(note_entry, st, checksum):
+                        unchanged = True
+                    else:
+                        on_disk = read_existing_checksum(target_path) if st is not None else None
+                        unchanged = on_disk == checksum
+
+                    wrote = False
+                    if unchanged:
+                        # No changes — truly skip (no re-import)
+                        logging.info("Duplicate/no-change: %s", target_path)
+                    elif (on_disk and on_disk.startswith(LEGACY_CHECKSUM_PREFIX)
+                            and legacy_checksum_matches(target_path, meta["checksum_payload"], on_disk)):
+                        # Written by an older version from this same content: keep the note
+                        # (and any edits made to it), only swap in the new checksum
+                        logging.info("Checksum upgrade: %s", target_path)
+                        unchanged = True
+                        if not args.dry_run:
+                            upgrade_checksum(target_path, on_disk, checksum)
+                            st = os.stat(target_path)
+                    else:
+                        action = "Update" if st is not None else "Write"
+                        logging.info(("%s (deduped): " if existing_path else "%s: ") % action + "%s", target_path)
+                        if not args.dry_run:
+                            ensure_dirs(target_path)
+                            write_note(target_path, md.encode("utf-8"))
+                            st = os.stat(target_path); wrote = True
+
+                with state_lock:
+                    # Remember size/mtime of the verified or freshly written note
+                    if unchanged or wrote:
+                        new_entry = {"checksum": checksum, "mtime_ns": st.st_mtime_ns, "size": st.st_size,
+                                     "msg_size": msg_size, "labels": label_list, "gm_msgid": gm_msgid}
+                        if index["notes"].get(str(target_path)) != new_entry:
+                            index["notes"][str(target_path)] = new_entry; index_updated.set()
+
+                    # Update indices (path + checksum) after write/skip
+                    key = str(gm_msgid) if gm_msgid else None
+                    if key:
+                        if index["by_gm_msgid"].get(key) != str(target_path):
+                            index["by_gm_msgid"][key] = str(target_path); index_updated.set()
+                    if message_id:
+                        if index["by_message_id"].get(message_id) != str(target_path):
+                            index["by_message_id"][message_id] = str(target_path); index_updated.set()
+
+                    # maintain legacy state for compat (optional)
+                    legacy_key = str(gm_msgid or uid)
+                    legacy_entry = legacy_state.get(legacy_key)
+                    if (not legacy_entry) or (legacy_entry.get("checksum") != checksum) or (legacy_entry.get("path") != str(target_path.relative_to(vault_root))):
+                        legacy_state[legacy_key] = {
+                            "path": str(target_path.relative_to(vault_root)),
+                            "checksum": checksum,
+                            "type": doc_type,
+                        }
 
             # NO EMBEDDING - This is the key difference!
             # The original script would embed here, but we skip that entirely.
             logging.debug("Markdown-only mode: skipping embedding for %s", target_path)
-
-            processed += 1
-
-        # persist index + legacy state
-        if index_updated and not args.dry_run:
-            save_index(index_path, index)
-        if not args.dry_run:
-            try: state_path.write_text(json.dumps(legacy_state, indent=2), encoding="utf-8")
-            except Exception: pass
+            return True
+
+        def worker():
+            nonlocal processed
+            while True:
+                item = work.get()
+                if item is None: return  # sentinel: producer finished
+                try:
+                    ok = handle(*item)
+                except Exception as e:
+                    logging.warning("Failed UID %s: %s", item[0], e); continue
+                if ok:
+                    with state_lock: processed += 1
+
+        n_workers = max(1, args.workers)
+        workers = [threading.Thread(target=worker, name=f"md-writer-{i}", daemon=True) for i in range(n_workers)]
+        for t in workers: t.start()
+        try:
+            for item in iter_fetched(srv, uids, fetch_keys):
+                work.put(item)
+        finally:
+            for _ in workers: work.put(None)
+            for t in workers: t.join()
+
+            # persist index + legacy state — also when a FETCH fails mid-run, so
+            # notes already written stay indexed (the exception re-raises after this)
+            if index_updated.is_set() and not args.dry_run:
+                save_index(index_path, index)
+            if not args.dry_run:
+                try: json_save_file(state_path, legacy_state)
+                except Exception: pass
 
         logging.info("Done. Processed %d message(s) - MARKDOWN ONLY (no embedding).", processed)
 
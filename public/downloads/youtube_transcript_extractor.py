@@ -13,7 +13,6 @@ Output:
 import sys
 import json
 import re
-from urllib.parse import urlparse, parse_qs
 
 try:
     from youtube_transcript_api import YouTubeTranscriptApi
@@ -26,6 +25,14 @@ except ImportError:
     sys.exit(1)
 
 
+# youtube.com/watch?...v=ID, /embed/ID, /shorts/ID and youtu.be/ID
+_YT_ID_RE = re.compile(
+    r"(?:https?://)?(?:www\.|m\.)?"
+    r"(?:youtube\.com/(?:watch\?(?:[^#]*&)?v=|embed/|shorts/)|youtu\.be/)"
+    r"([A-Za-z0-9_-]{11})"
+)
+
+
 def extract_video_id(url):
     """
     Extract video ID from various YouTube URL formats.
@@ -34,18 +41,10 @@ def extract_video_id(url):
     - https://www.youtube.com/watch?v=VIDEO_ID
     - https://youtu.be/VIDEO_ID
     - https://www.youtube.com/embed/VIDEO_ID
+    - https://www.youtube.com/shorts/VIDEO_ID
     """
-    parsed = urlparse(url)
-
-    if parsed.hostname in ('www.youtube.com', 'youtube.com'):
-        if parsed.path == '/watch':
-            return parse_qs(parsed.query).get('v', [None])[0]
-        elif parsed.path.startswith('/embed/'):
-            return parsed.path.split('/')[2]
-    elif parsed.hostname == 'youtu.be':
-        return parsed.path[1:]
-
-    return None
+    m = _YT_ID_RE.match(url.strip())
+    return m.group(1) if m else None
 
 
 def get_video_metadata(video_id):
@@ -69,33 +68,30 @@ def get_transcript(video_id):
         # Create API instance
         api = YouTubeTranscriptApi()
 
-        # Try to get English transcript first
-        languages = ['en', 'en-US', 'en-GB']
-        fetched = None
-
-        for lang in languages:
-            try:
-                fetched = api.fetch(video_id, languages=[lang])
-                break
-            except:
-                continue
-
-        # If no English transcript, try any available language
-        if not fetched:
-            try:
-                fetched = api.fetch(video_id)
-            except Exception as e:
+        # One listing request covers every language; prefer English
+        transcript_list = api.list(video_id)
+        try:
+            transcript = transcript_list.find_transcript(['en', 'en-US', 'en-GB'])
+        except NoTranscriptFound:
+            # If no English transcript, take any available language
+            transcript = next(iter(transcript_list), None)
+            if transcript is None:
                 raise Exception(f"No transcript available for video: {video_id}")
 
-        # Combine all text segments
-        full_text = ' '.join([snippet.text for snippet in fetched.snippets])
-
-        # Get timestamped segments for reference
-        segments = [{
-            'start': snippet.start,
-            'duration': snippet.duration,
-            'text': snippet.text
-        } for snippet in fetched.snippets]
+        fetched = transcript.fetch()
+
+        # One pass: text for the combined transcript, timestamped segments for reference
+        texts = []
+        segments = []
+        for snippet in fetched.snippets:
+            text = snippet.text
+            texts.append(text)
+            segments.append({
+                'start': snippet.start,
+                'duration': snippet.duration,
+                'text': text
+            })
+        full_text = ' '.join(texts)
 
         return {
             'language': fetched.language_code,
@@ -146,7 +142,8 @@ def main():
             "success": True
         }
 
-        print(json.dumps(result, indent=2))
+        # Compact output: read by the /youtube command, not by people
+        print(json.dumps(result, separators=(',', ':')))
 
     except Exception as e:
         print(json.dumps({